@@ -5,6 +5,7 @@ import (
 	"context"
 	"encoding/json"
 	"fmt"
+	"io"
 	"net/http"
 	"os"
 	"sync"
@@ -57,7 +58,8 @@ func NewBidPredictorHTTP(serviceURL string) (Predictor, error) {
 	p := &BidPredictorHTTP{
 		serviceURL: serviceURL,
 		client: &http.Client{
-			Timeout: 30 * time.Second,
+			Timeout:   30 * time.Second,
+			Transport: newKeepAliveTransport(),
 		},
 	}
 
@@ -72,6 +74,24 @@ func NewBidPredictorHTTP(serviceURL string) (Predictor, error) {
 	return p, nil
 }
 
+// newKeepAliveTransport pools connections to the ML service so predictions
+// reuse an open connection instead of paying a TCP (and TLS) handshake each.
+// The idle timeout stays below the service's 65s keep-alive so the client
+// always drops idle connections first.
+func newKeepAliveTransport() *http.Transport {
+	t := http.DefaultTransport.(*http.Transport).Clone()
+	t.MaxIdleConns = 100
+	t.MaxIdleConnsPerHost = 64
+	t.IdleConnTimeout = 60 * time.Second
+	return t
+}
+
+// drainAndClose reads any unread body so the connection returns to the pool
+func drainAndClose(body io.ReadCloser) {
+	_, _ = io.Copy(io.Discard, body)
+	body.Close()
+}
+
 // Predict returns the optimal bid
 func (p *BidPredictorHTTP) Predict(features BidFeatures) (float64, error) {
 	p.mu.RLock()
@@ -115,7 +135,7 @@ func (p *BidPredictorHTTP) Predict(features BidFeatures) (float64, error) {
 	if err != nil {
 		return 0, fmt.Errorf("failed to call ML service: %w", err)
 	}
-	defer resp.Body.Close()
+	defer drainAndClose(resp.Body)
 
 	if resp.StatusCode != http.StatusOK {
 		return 0, fmt.Errorf("ML service returned status %d", resp.StatusCode)
@@ -158,7 +178,7 @@ func (p *BidPredictorHTTP) healthCheck(ctx context.Context) error {
 	if err != nil {
 		return err
 	}
-	defer resp.Body.Close()
+	defer drainAndClose(resp.Body)
 
 	if resp.StatusCode != http.StatusOK {
 		return fmt.Errorf("health check failed with status %d", resp.StatusCode)
@@ -0,0 +1,104 @@
+# ml-service/features.py
+"""
+Feature parsing for /predict.
+
+This module is kept free of FastAPI so the Docker build can compile it to a C
+extension with mypyc (`mypyc features.py`). When it is not compiled the
+plain Python module is imported instead.
+"""
+import sys
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+EncoderIndex = Dict[str, Dict[str, int]]
+EncoderValues = Dict[str, Any]
+
+# Request fields in training column order, with their defaults
+FIELDS = (
+    ('floor_price', 0.0),
+    ('engagement_score', 0.0),
+    ('conversion_probability', 0.0),
+    ('historical_win_rate', 0.0),
+    ('historical_avg_bid', 0.0),
+    ('historical_avg_win_price', 0.0),
+    ('device_type', 'unknown'),
+    ('segment_category', 'unknown'),
+    ('hour_of_day', 0),
+    ('day_of_week', 0),
+    ('country', 'unknown'),
+    ('campaign_spend_last_7d', 0.0),
+    ('campaign_conversions_last_7d', 0.0),
+)
+
+# Categorical request fields and the row column each one is encoded into
+ENCODED_FIELDS = (('device_type', 6), ('segment_category', 7), ('country', 10))
+
+
+def build_encoder_tables(
+    encoders: Dict[str, Dict[str, Any]]) -> Tuple[EncoderIndex, EncoderValues]:
+  """
+  Split the JSON encoders into per-field {category: index} maps and
+  contiguous float32 value arrays. Each array has an extra last slot
+  holding 0.0, which unseen categories index with -1.
+  """
+  idx: EncoderIndex = {}
+  val: EncoderValues = {}
+  for field, mapping in encoders.items():
+    idx[field] = {sys.intern(str(k)): i for i, k in enumerate(mapping)}
+    values = list(mapping.values()) + [0.0]
+    val[field] = np.fromiter(values, dtype=np.float32, count=len(values))
+  return idx, val
+
+
+def category_index(enc_idx: EncoderIndex, field: str, value: Any) -> float:
+  """Index of a categorical value in its encoder table, -1.0 when unseen"""
+  return float(enc_idx[field].get(value, -1))
+
+
+def feature_row(features: Dict[str, Any],
+                enc_idx: EncoderIndex) -> Tuple[float, ...]:
+  """
+  Parse the request into its 13 raw feature values in training column order.
+  Categorical columns hold their encoder index; the values are looked up per
+  batch by kernels.encode_rows()
+  """
+  vals = [features.get(k, d) for k, d in FIELDS]
+  return (
+      float(vals[0]),
+      float(vals[1]),
+      float(vals[2]),
+      float(vals[3]),
+      float(vals[4]),
+      float(vals[5]),
+      category_index(enc_idx, 'device_type', vals[6]),
+      category_index(enc_idx, 'segment_category', vals[7]),
+      float(vals[8]),
+      float(vals[9]),
+      category_index(enc_idx, 'country', vals[10]),
+      float(vals[11]),
+      float(vals[12]),
+  )
+
+
+def feature_key(row: Tuple[float, ...]) -> Tuple[float, ...]:
+  """
+  Round a feature_row() to a business-safe precision so near-duplicate
+  requests share a prediction cache entry. Only used as the cache key; the
+  model always scores the unrounded row
+  """
+  return (
+      round(row[0], 2),     # floor_price
+      round(row[1], 3),     # engagement_score
+      round(row[2], 3),     # conversion_probability
+      round(row[3], 3),     # historical_win_rate
+      round(row[4], 2),     # historical_avg_bid
+      round(row[5], 2),     # historical_avg_win_price
+      row[6],               # device_type
+      row[7],               # segment_category
+      row[8],               # hour_of_day
+      row[9],               # day_of_week
+      row[10],              # country
+      round(row[11], 1),    # campaign_spend_last_7d
+      row[12],              # campaign_conversions_last_7d
+  )
@@ -0,0 +1,40 @@
+# ml-service/gunicorn_conf.py
+"""
+Gunicorn settings for the ML service.
+
+Each worker is one process running a uvicorn event loop: requests in flight
+share the loop and are micro-batched into a single predict call, so we run
+one worker per CPU instead of many single-threaded ones.
+"""
+import multiprocessing
+import os
+
+# Inherited by the workers before they import xgboost
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# uvicorn with uvloop and httptools when installed (uvicorn[standard]);
+# worker_connections caps concurrent requests per worker
+worker_class = 'uvicorn_worker.UvicornWorker'
+worker_connections = 1000
+# Longer than the Go client's 60s idle timeout, so the client always closes
+# idle connections first and never writes to one the server just dropped
+keepalive = 65
+timeout = 60
+# Import the app in the master so the model is loaded once and shared
+# copy-on-write by the forked workers
+preload_app = True
+
+
+def when_ready(server):
+  """Load the model in the master before any worker is forked"""
+  import ml_service
+  ml_service.load_model()
+
+
+def post_fork(server, worker):
+  """Retry in the worker if the master failed to load the model"""
+  import ml_service
+  if ml_service.get_state() is None:
+    ml_service.load_model()
@@ -0,0 +1,61 @@
+# ml-service/kernels.py
+"""
+Numeric kernels for the scoring path.
+
+encode_rows() is JIT-compiled with Numba when it is installed and falls back
+to vectorized NumPy otherwise. It runs single-threaded: batches are at most
+ML_MAX_BATCH rows and workers are pinned to one thread, so a parallel loop
+would cost more to launch than it saves.
+"""
+import numpy as np
+
+from features import ENCODED_FIELDS
+
+try:
+  from numba import njit
+except ImportError:
+  njit = None
+
+
+def build_lookup(enc_val):
+  """
+  Flatten the per-field encoder value arrays (in ENCODED_FIELDS order) into
+  one contiguous table plus the row column, offset and size of each field
+  """
+  arrays = [enc_val[field] for field, _ in ENCODED_FIELDS]
+  columns = np.array([column for _, column in ENCODED_FIELDS], dtype=np.int64)
+  sizes = np.array([len(a) for a in arrays], dtype=np.int64)
+  offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+  values = np.concatenate(arrays).astype(np.float32)
+  return columns, offsets, sizes, values
+
+
+def _encode_rows_loop(rows, columns, offsets, sizes, values):
+  for i in range(rows.shape[0]):
+    for c in range(columns.shape[0]):
+      j = int(rows[i, columns[c]])
+      if j < 0:
+        j = sizes[c] - 1
+      rows[i, columns[c]] = values[offsets[c] + j]
+
+
+def _encode_rows_numpy(rows, columns, offsets, sizes, values):
+  for c in range(len(columns)):
+    j = rows[:, columns[c]].astype(np.int64)
+    j[j < 0] = sizes[c] - 1
+    rows[:, columns[c]] = values[offsets[c] + j]
+
+
+if njit is not None:
+  _encode_rows = njit(cache=True)(_encode_rows_loop)
+else:
+  _encode_rows = _encode_rows_numpy
+
+
+def encode_rows(rows, lookup):
+  """
+  Replace the encoder indices in the categorical columns of a (N, 13)
+  float32 array with their encoded values, in place. Index -1 (unseen)
+  maps to each table's trailing 0.0 slot.
+  """
+  _encode_rows(rows, *lookup)
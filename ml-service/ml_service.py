@@ -1,33 +1,346 @@
 # ml-service/ml_service.py
-from flask import Flask, request, jsonify
+import os
+
+# One OpenMP thread per process: we scale with worker processes instead
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
 import xgboost as xgb
 import numpy as np
+import orjson
+import asyncio
 import json
 import logging
-import os
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Compiled with mypyc in the Docker image, plain Python otherwise
+from features import build_encoder_tables, feature_key, feature_row
+from kernels import build_lookup, encode_rows
+
+# Treelite/TL2cgen are optional: without them we serve with the XGBoost booster
+try:
+  import treelite
+  import tl2cgen
+except ImportError:
+  treelite = None
+  tl2cgen = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+MODEL_VERSION = 'bid_optimizer_latest'
+# /health has only two possible bodies, so encode them once
+_HEALTHY = orjson.dumps({'status': 'healthy', 'model_loaded': True})
+_UNHEALTHY = orjson.dumps({'status': 'unhealthy', 'model_loaded': False})
 
-# Global variables for model
-model = None
-encoders = None
-model_loaded = False
-feature_names = [
+# Training column order. Inputs are passed positionally, so this is checked
+# against the model once at load instead of being sent with every request
+_FEATURE_NAMES = (
     'floor_price', 'engagement_score', 'conversion_probability',
     'historical_win_rate', 'historical_avg_bid', 'historical_avg_win_price',
     'device_type_encoded', 'segment_category_encoded', 'hour_of_day',
     'day_of_week', 'country_encoded', 'campaign_spend_last_7d',
     'campaign_conversions_last_7d'
-]
+)
+
+
+@dataclass(slots=True, frozen=True)
+class State:
+  """
+  Everything a prediction needs, built by load_model() and published as one
+  immutable snapshot. Handlers bind _STATE to a local once per request.
+  """
+  booster: Any
+  # Treelite-compiled predictor, None when serving with the booster
+  predictor: Any
+  # category -> index per field, see features.build_encoder_tables()
+  enc_idx: Any
+  # Flat encoder value table, see kernels.build_lookup()
+  enc_lookup: Any
+
+
+_STATE: Optional[State] = None
+
+# Micro-batching: requests in flight on the event loop are coalesced into one
+# predict call of up to MAX_BATCH rows, waiting at most MAX_WAIT seconds for
+# the batch to fill. Set ML_MAX_BATCH=1 to score every request inline.
+MAX_BATCH = int(os.environ.get('ML_MAX_BATCH', '64'))
+MAX_WAIT = float(os.environ.get('ML_MAX_WAIT_MS', '5')) / 1000.0
+
+# Created in each worker's event loop by lifespan()
+_batch_queue: Optional[asyncio.Queue] = None
+
+# (1, 13) input buffer and (1,) raw floor price for unbatched scoring; the
+# event loop is single-threaded
+_row_buffer = np.empty((1, len(_FEATURE_NAMES)), dtype=np.float32)
+_floor_buffer = np.empty(1, dtype=np.float64)
+
+# Model scores memoized per rounded feature vector; 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.environ.get('ML_PREDICTION_CACHE', '65536'))
+
+# Optional minimum bid as a multiple of the request's floor price, mirroring
+# the training target's clip (e.g. 1.01). A pricing rule of this service, not
+# of the model, so it is off (0) until product approves it
+FLOOR_MARKUP = float(os.environ.get('ML_FLOOR_MARKUP', '0'))
+
+# Max prediction difference accepted from the quantized-threshold library
+QUANTIZE_TOLERANCE = 1e-3
+
+
+def threshold_probe(booster, n_rows=1024, seed=0):
+  """
+  Build probe rows from the model's split thresholds and the midpoints
+  between them, so every split is exercised on both sides and at its edge
+  """
+  names = booster.feature_names or [
+      f'f{i}' for i in range(booster.num_features())]
+  column = {name: i for i, name in enumerate(names)}
+  splits = booster.trees_to_dataframe()
+  splits = splits[splits['Feature'] != 'Leaf']
+
+  rng = np.random.default_rng(seed)
+  rows = np.zeros((n_rows, len(names)), dtype=np.float32)
+  for name, group in splits.groupby('Feature'):
+    t = np.unique(group['Split'].to_numpy(dtype=np.float64))
+    values = np.concatenate(
+        [[t[0] - 1.0], t, (t[:-1] + t[1:]) / 2, [t[-1] + 1.0]])
+    rows[:, column[name]] = rng.choice(values, n_rows)
+  return rows
+
+
+def _load_lib(booster, model_path, libpath, params):
+  """Export the booster to libpath unless it is newer than the model"""
+  if (not os.path.exists(libpath)
+          or os.path.getmtime(libpath) < os.path.getmtime(model_path)):
+    logger.info(f"Compiling model to {libpath}")
+    tl_model = treelite.frontend.from_xgboost(booster)
+    tl2cgen.export_lib(tl_model, toolchain='gcc', libpath=libpath,
+                       params=params)
+  return tl2cgen.Predictor(libpath, nthread=1)
+
+
+def compile_predictor(booster, model_path):
+  """Compile the booster to a native shared library and load it.
+
+  The library is written next to the model JSON and reused as long as it is
+  newer than the model, so the Docker build can ship it prebuilt. Split
+  thresholds are quantized to integer bins; if that moves predictions by
+  more than QUANTIZE_TOLERANCE on a probe set, an unquantized library is
+  used instead.
+  """
+  if tl2cgen is None:
+    logger.warning("treelite/tl2cgen not installed, serving with XGBoost")
+    return None
+
+  models_dir = os.path.dirname(model_path)
+  try:
+    lib = _load_lib(booster, model_path,
+                    os.path.join(models_dir, 'bid_optimizer.so'),
+                    {'parallel_comp': 8, 'quantize': 1})
+
+    probe = threshold_probe(booster)
+    drift = float(np.max(np.abs(
+        lib.predict(tl2cgen.DMatrix(probe)).reshape(-1)
+        - booster.inplace_predict(probe))))
+    if drift <= QUANTIZE_TOLERANCE:
+      logger.info(f"Quantized predictor drift: {drift:.2e}")
+      return lib
+
+    logger.warning(
+        f"Quantized predictor drift {drift:.2e} too high, using FP32 library")
+    return _load_lib(booster, model_path,
+                     os.path.join(models_dir, 'bid_optimizer_fp32.so'),
+                     {'parallel_comp': 8})
+  except Exception as e:
+    logger.error(f"Failed to compile model, serving with XGBoost: {e}")
+    return None
+
+
+def get_state():
+  """Return the loaded State, or None when no model is loaded"""
+  return _STATE
+
+
+def score_rows(s, feature_array):
+  """Run the model on a (N, 13) float32 array of encoded rows"""
+  if s.predictor is not None:
+    return s.predictor.predict(tl2cgen.DMatrix(feature_array)).reshape(-1)
+
+  return s.booster.inplace_predict(feature_array)
+
+
+def floor_guard(scores, floor_prices):
+  """
+  With FLOOR_MARKUP set, round model scores to 4 decimals and raise any
+  below FLOOR_MARKUP x floor price to that minimum, itself rounded up to 4
+  decimals so the returned bid is never under it. Otherwise the scores are
+  returned unchanged. floor_prices are the float64 request values, not the
+  float32 column 0 of the feature rows.
+  """
+  if FLOOR_MARKUP <= 0:
+    return scores
+  bids = np.round(scores, 4)
+  minimum = np.multiply(floor_prices, FLOOR_MARKUP)
+  minimum *= 1e4
+  # The epsilon keeps exact products such as 2.5 x 1.01 from rounding up
+  minimum -= 1e-6
+  np.ceil(minimum, out=minimum)
+  minimum /= 1e4
+  np.maximum(bids, minimum, out=bids)
+  return bids
+
+
+def guard_bid(score, floor_price):
+  """floor_guard() for a single cached score"""
+  if FLOOR_MARKUP <= 0:
+    return score
+  bid = float(np.round(score, 4))
+  return max(bid, math.ceil(floor_price * FLOOR_MARKUP * 1e4 - 1e-6) / 1e4)
+
+
+def predict_rows(s, feature_array, floor_prices):
+  """
+  Score a (N, 13) float32 array of raw rows from feature_row(), with the
+  (N,) raw floor price of each row. The categorical columns are encoded in
+  place first. Returns the N model scores, which are what gets cached, and
+  the N bids after floor_guard().
+  """
+  encode_rows(feature_array, s.enc_lookup)
+  scores = np.asarray(score_rows(s, feature_array), dtype=np.float64)
+  return scores, floor_guard(scores, floor_prices)
+
+
+class PredictionCache:
+  """
+  LRU of model scores keyed on feature_key() tuples. Only touched from the event
+  loop, so it needs no locking; maxsize 0 disables it.
+  """
+  __slots__ = ('maxsize', '_data')
+
+  def __init__(self, maxsize):
+    self.maxsize = maxsize
+    self._data = OrderedDict()
+
+  def get(self, key):
+    score = self._data.get(key)
+    if score is not None:
+      self._data.move_to_end(key)
+    return score
+
+  def put(self, key, score):
+    if self.maxsize <= 0:
+      return
+    self._data[key] = score
+    if len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+
+  def clear(self):
+    self._data.clear()
+
+
+_prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+
+async def _batch_loop():
+  """Drain the queue into batches and resolve each request's future"""
+  loop = asyncio.get_running_loop()
+  # Allocated once per worker; each batch is a leading-rows view
+  buf = np.empty((max(MAX_BATCH, 1), len(_FEATURE_NAMES)), dtype=np.float32)
+  floor_buf = np.empty(max(MAX_BATCH, 1), dtype=np.float64)
+  while True:
+    items = [await _batch_queue.get()]
+    deadline = loop.time() + MAX_WAIT
+    while len(items) < MAX_BATCH:
+      if not _batch_queue.empty():
+        items.append(_batch_queue.get_nowait())
+        continue
+      timeout = deadline - loop.time()
+      if timeout <= 0:
+        break
+      try:
+        items.append(await asyncio.wait_for(_batch_queue.get(), timeout))
+      except asyncio.TimeoutError:
+        break
+
+    batch = buf[:len(items)]
+    floor_prices = floor_buf[:len(items)]
+    for i, (row, floor_price, _) in enumerate(items):
+      batch[i] = row
+      floor_prices[i] = floor_price
+
+    # Scored on the loop itself: a batch takes well under a millisecond,
+    # less than handing it to an executor thread and back
+    try:
+      s = _STATE
+      if s is None:
+        raise RuntimeError('Model not loaded')
+      scores, bids = predict_rows(s, batch, floor_prices)
+    except Exception as e:
+      for _, _, future in items:
+        if not future.done():
+          future.set_exception(e)
+      continue
+
+    # A future is already done if its client disconnected
+    for (_, _, future), score, bid in zip(items, scores, bids):
+      if not future.done():
+        future.set_result((float(score), float(bid)))
+
+
+async def predict_one(s, row, floor_price):
+  """
+  Score a feature tuple from feature_row() against the request's raw floor
+  price, batched when enabled. Returns (score, bid).
+  """
+  if MAX_BATCH <= 1:
+    _row_buffer[0] = row
+    _floor_buffer[0] = floor_price
+    scores, bids = predict_rows(s, _row_buffer, _floor_buffer)
+    return float(scores[0]), float(bids[0])
+
+  future = asyncio.get_running_loop().create_future()
+  _batch_queue.put_nowait((row, floor_price, future))
+  return await future
+
+
+def check_feature_order(booster):
+  """Fail loading if the model's columns do not match _FEATURE_NAMES"""
+  if booster.num_features() != len(_FEATURE_NAMES):
+    raise ValueError(f"Model expects {booster.num_features()} features, "
+                     f"service sends {len(_FEATURE_NAMES)}")
+  if booster.feature_names and tuple(booster.feature_names) != _FEATURE_NAMES:
+    raise ValueError(f"Model feature order {booster.feature_names} does not "
+                     f"match service order {list(_FEATURE_NAMES)}")
+
+
+def warm_up(booster, lib, lookup, rounds=12):
+  """
+  Run throwaway predictions so the first real requests do not pay for
+  lazy predictor initialization, kernel JIT compilation and buffer growth
+  """
+  start = time.perf_counter()
+  warm = np.zeros((32, booster.num_features()), dtype=np.float32)
+  encode_rows(warm.copy(), lookup)
+  booster.inplace_predict(warm)
+  if lib is not None:
+    lib.predict(tl2cgen.DMatrix(warm))
+  for _ in range(rounds):
+    booster.inplace_predict(warm[:1])
+    if lib is not None:
+      lib.predict(tl2cgen.DMatrix(warm[:1]))
+  logger.info(f"   Warm-up: {(time.perf_counter() - start) * 1000:.1f} ms")
 
 
 def load_model():
   """Load the XGBoost model and encoders"""
-  global model, encoders, model_loaded
+  global _STATE
 
   try:
     # In production (Cloud Run), models are in ./models/
@@ -40,92 +353,111 @@ def load_model():
       encoders_path = '../models/bid_optimizer_latest_encoders.json'
 
     logger.info(f"Loading model from {model_path}")
-    model = xgb.Booster()
-    model.load_model(model_path)
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    check_feature_order(booster)
+    # Thread start-up dominates single-row inference
+    booster.set_param({'nthread': 1})
+    predictor = compile_predictor(booster, model_path)
 
     logger.info(f"Loading encoders from {encoders_path}")
     with open(encoders_path, 'r') as f:
       encoders = json.load(f)
+    enc_idx, enc_val = build_encoder_tables(encoders)
+    enc_lookup = build_lookup(enc_val)
 
     logger.info("✅ Model loaded successfully!")
-    logger.info(f"   Features: {model.num_features()}")
-    logger.info(f"   Trees: {model.num_boosted_rounds()}")
+    logger.info(f"   Features: {booster.num_features()}")
+    logger.info(f"   Trees: {booster.num_boosted_rounds()}")
+    logger.info(f"   Backend: {'treelite' if predictor else 'xgboost'}")
+    warm_up(booster, predictor, enc_lookup)
 
-    model_loaded = True
+    _STATE = State(booster=booster, predictor=predictor, enc_idx=enc_idx,
+                   enc_lookup=enc_lookup)
+    _prediction_cache.clear()
     return True
 
   except FileNotFoundError as e:
     logger.error(f"Model files not found: {e}")
-    model_loaded = False
+    _STATE = None
     return False
   except Exception as e:
     logger.error(f"Failed to load model: {e}")
-    model_loaded = False
+    _STATE = None
     return False
 
 
-@app.route('/health', methods=['GET'])
-def health():
+@asynccontextmanager
+async def lifespan(app):
+  """
+  Start the batcher in the worker's event loop, after any fork. Loads the
+  model first when nothing has yet: `uvicorn ml_service:app`, or gunicorn
+  without gunicorn_conf.py's hooks.
+  """
+  global _batch_queue
+  if _STATE is None:
+    load_model()
+  _batch_queue = asyncio.Queue()
+  batcher = asyncio.create_task(_batch_loop())
+  yield
+  batcher.cancel()
+
+
+# No interactive docs: the service has two fixed endpoints
+app = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None,
+              openapi_url=None)
+
+
+def json_response(body, status=200):
+  """Serialize with orjson into a plain Response"""
+  if not isinstance(body, bytes):
+    body = orjson.dumps(body)
+  return Response(body, status_code=status, media_type='application/json')
+
+
+@app.get('/health')
+async def health():
   """Health check endpoint"""
-  return jsonify({
-      'status': 'healthy' if model_loaded else 'unhealthy',
-      'model_loaded': model_loaded
-  })
+  return json_response(_HEALTHY if _STATE is not None else _UNHEALTHY)
 
 
-@app.route('/predict', methods=['POST'])
-def predict():
+@app.post('/predict')
+async def predict(request: Request):
   """Prediction endpoint"""
-  if not model_loaded:
-    return jsonify({'error': 'Model not loaded'}), 503
+  s = _STATE
+  if s is None:
+    return json_response({'error': 'Model not loaded'}, 503)
 
   try:
-    data = request.json
+    data = orjson.loads(await request.body())
     features = data.get('features', {})
 
-    # Encode categorical features
-    device_type_encoded = encoders['device_type'].get(
-        features.get('device_type', 'unknown'), 0)
-    segment_encoded = encoders['segment_category'].get(
-        features.get('segment_category', 'unknown'), 0)
-    country_encoded = encoders['country'].get(
-        features.get('country', 'unknown'), 0)
-
-    # Create feature array in correct order
-    feature_array = np.array([[
-        features.get('floor_price', 0.0),
-        features.get('engagement_score', 0.0),
-        features.get('conversion_probability', 0.0),
-        features.get('historical_win_rate', 0.0),
-        features.get('historical_avg_bid', 0.0),
-        features.get('historical_avg_win_price', 0.0),
-        device_type_encoded,
-        segment_encoded,
-        features.get('hour_of_day', 0),
-        features.get('day_of_week', 0),
-        country_encoded,
-        features.get('campaign_spend_last_7d', 0.0),
-        features.get('campaign_conversions_last_7d', 0.0)
-    ]], dtype=np.float32)
-
-    # Make prediction with feature names
-    dmatrix = xgb.DMatrix(feature_array, feature_names=feature_names)
-    prediction = float(model.predict(dmatrix)[0])
-
-    return jsonify({
+    # The rounded key only picks the cache entry; a miss scores the raw row
+    row = feature_row(features, s.enc_idx)
+    if PREDICTION_CACHE_SIZE <= 0:
+      _, prediction = await predict_one(s, row, row[0])
+    else:
+      key = feature_key(row)
+      score = _prediction_cache.get(key)
+      if score is None:
+        score, prediction = await predict_one(s, row, row[0])
+        _prediction_cache.put(key, score)
+      else:
+        prediction = guard_bid(score, row[0])
+
+    return json_response({
         'predicted_bid': prediction,
-        'model_version': 'bid_optimizer_latest'
+        'model_version': MODEL_VERSION
     })
 
   except Exception as e:
     logger.error(f"Prediction error: {e}")
-    return jsonify({'error': str(e)}), 500
+    return json_response({'error': str(e)}, 500)
 
 
 if __name__ == '__main__':
+  import uvicorn
+
   logger.info("🚀 Starting on port 5001")
   load_model()
-  app.run(host='0.0.0.0', port=5001, debug=False)
-else:
-  # When running with gunicorn
-  load_model()
+  uvicorn.run(app, host='0.0.0.0', port=5001)
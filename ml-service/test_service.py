@@ -3,15 +3,19 @@
 Test script for ML Prediction Service
 """
 
+import os
 import requests
 import json
 
-BASE_URL = "http://localhost:5001"
+BASE_URL = os.environ.get("ML_SERVICE_URL", "http://localhost:5001")
+
+# Reuse one connection for all requests, like the Go client does
+session = requests.Session()
 
 def test_health():
     """Test health endpoint"""
     print("🧪 Testing /health...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = session.get(f"{BASE_URL}/health")
     print(f"   Status: {response.status_code}")
     print(f"   Response: {response.json()}")
     assert response.status_code == 200
@@ -38,7 +42,7 @@ def test_predict():
         "campaign_conversions_last_7d": 8.0
     }
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/predict",
         json={"features": test_data},
         headers={"Content-Type": "application/json"}
@@ -74,12 +78,31 @@ def test_multiple_scenarios():
     ]
     
     for scenario in scenarios:
-        response = requests.post(f"{BASE_URL}/predict", json={"features": scenario["data"]})
+        response = session.post(f"{BASE_URL}/predict", json={"features": scenario["data"]})
         result = response.json()
         print(f"   {scenario['name']}: ${result['predicted_bid']:.2f}")
     
     print("   ✅ Multiple scenarios passed")
 
+def test_keep_alive():
+    """Test that the service keeps the connection open between requests"""
+    print("\n🧪 Testing keep-alive...")
+
+    # A reused connection keeps its local port; a new one gets another
+    ports = set()
+    for _ in range(3):
+        response = session.post(f"{BASE_URL}/predict", json={"features": {"floor_price": 2.5}}, stream=True)
+        sock = response.raw.connection.sock
+        assert sock is not None, "server closed the connection"
+        ports.add(sock.getsockname()[1])
+        response.content  # Reading the body returns the connection to the pool
+        assert response.status_code == 200
+
+    print(f"   Local ports: {sorted(ports)}")
+    assert len(ports) == 1, "connection was not reused"
+
+    print("   ✅ Keep-alive passed")
+
 if __name__ == "__main__":
     print("🚀 Testing ML Prediction Service")
     print("=" * 50)
@@ -88,6 +111,7 @@ if __name__ == "__main__":
         test_health()
         test_predict()
         test_multiple_scenarios()
+        test_keep_alive()
         
         print("\n" + "=" * 50)
         print("✅ All tests passed!")
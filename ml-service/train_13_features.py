@@ -108,11 +108,17 @@ if __name__ == '__main__':
     import os
     os.makedirs('../models', exist_ok=True)
 
-    model.save_model('../models/bid_optimizer_latest.json')
+    # Replace, never rewrite: "latest" can be a hardlink to an archived
+    # model. The temp name keeps .json, which save_model() reads the format from
+    model.save_model('../models/bid_optimizer_latest.tmp.json')
+    os.replace('../models/bid_optimizer_latest.tmp.json',
+               '../models/bid_optimizer_latest.json')
     print("\n✅ Model saved to ../models/bid_optimizer_latest.json")
 
-    with open('../models/bid_optimizer_latest_encoders.json', 'w') as f:
+    with open('../models/bid_optimizer_latest_encoders.json.tmp', 'w') as f:
         json.dump(encoders, f, indent=2)
+    os.replace('../models/bid_optimizer_latest_encoders.json.tmp',
+               '../models/bid_optimizer_latest_encoders.json')
     print("✅ Encoders saved to ../models/bid_optimizer_latest_encoders.json")
 
     model_info = {
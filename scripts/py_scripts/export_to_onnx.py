@@ -19,6 +19,48 @@ except ImportError:
   exit(1)
 
 
+def make_session(onnx_path):
+  """Create an ONNX Runtime session tuned for single-row CPU inference"""
+  import onnxruntime as rt
+
+  so = rt.SessionOptions()
+  so.graph_optimization_level = rt.GraphOptimizationLevel.ORT_ENABLE_ALL
+  so.intra_op_num_threads = 1
+  so.execution_mode = rt.ExecutionMode.ORT_SEQUENTIAL
+  return rt.InferenceSession(
+      str(onnx_path), so, providers=["CPUExecutionProvider"])
+
+
+def export_fp16(onnx_model, fp32_sess, probe, models_dir, tolerance=1e-3):
+  """Save an FP16 copy of the model if it predicts within tolerance of FP32"""
+  try:
+    from onnxconverter_common import float16
+  except ImportError:
+    print("⚠️  onnxconverter-common not installed, skipping FP16 export")
+    return None
+
+  print("\n🔄 Converting to FP16...")
+  fp16_model = float16.convert_float_to_float16(onnx_model, keep_io_types=True)
+  fp16_path = models_dir / "bid_optimizer_latest_fp16.onnx"
+  with open(fp16_path, "wb") as f:
+    f.write(fp16_model.SerializeToString())
+
+  fp16_sess = make_session(fp16_path)
+  input_name = fp32_sess.get_inputs()[0].name
+  fp32_pred = fp32_sess.run(None, {input_name: probe})[0]
+  fp16_pred = fp16_sess.run(None, {input_name: probe})[0]
+  drift = float(np.max(np.abs(fp32_pred - fp16_pred)))
+
+  if drift > tolerance:
+    fp16_path.unlink()
+    print(f"⚠️  FP16 drift {drift:.2e} exceeds {tolerance:.0e}, keeping FP32 only")
+    return None
+
+  size_mb = fp16_path.stat().st_size / (1024 * 1024)
+  print(f"✅ FP16 model saved to {fp16_path} ({size_mb:.2f} MB, drift {drift:.2e})")
+  return fp16_path
+
+
 def export_to_onnx():
   """Export XGBoost model to ONNX format"""
 
@@ -48,17 +90,18 @@ def export_to_onnx():
     # Save ONNX model
     onnx_path = models_dir / "bid_optimizer_latest.onnx"
 
-    with open(onnx_path, "wb") as f:
+    # Replace, never rewrite: "latest" can be a hardlink to an archived model
+    tmp_path = onnx_path.with_suffix(".onnx.tmp")
+    with open(tmp_path, "wb") as f:
       f.write(onnx_model.SerializeToString())
+    tmp_path.replace(onnx_path)
 
     size_mb = onnx_path.stat().st_size / (1024 * 1024)
     print(f"✅ ONNX model saved to {onnx_path} ({size_mb:.2f} MB)")
 
     # Test the ONNX model
     print("\n🧪 Testing ONNX model...")
-    import onnxruntime as rt
-
-    sess = rt.InferenceSession(str(onnx_path))
+    sess = make_session(onnx_path)
     input_name = sess.get_inputs()[0].name
 
     # Test prediction with dummy data
@@ -84,7 +127,12 @@ def export_to_onnx():
     )
 
     pred = sess.run(None, {input_name: test_input})
-    print(f"✅ Test prediction: ${pred[0][0]:.2f}")
+    print(f"✅ Test prediction: ${pred[0].ravel()[0]:.2f}")
+
+    # Compare FP16 against FP32 on rows scattered around the test input
+    rng = np.random.default_rng(42)
+    probe = (test_input * rng.uniform(0.5, 1.5, (256, 13))).astype(np.float32)
+    export_fp16(onnx_model, sess, probe, models_dir)
 
     print("\n" + "=" * 60)
     print("🎉 Success! ONNX model is ready for Go!")
@@ -51,8 +51,11 @@ def downgrade_and_export():
       )
 
       onnx_path = models_dir / "bid_optimizer_latest.onnx"
-      with open(onnx_path, "wb") as f:
+      # Replace, never rewrite: "latest" can be a hardlink to an archived model
+      tmp_path = onnx_path.with_suffix(".onnx.tmp")
+      with open(tmp_path, "wb") as f:
         f.write(onnx_model.SerializeToString())
+      tmp_path.replace(onnx_path)
 
       print(f"✅ ONNX export successful!")
       print(f"   File: {onnx_path}")
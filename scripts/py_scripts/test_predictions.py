@@ -2,7 +2,6 @@
 
 import xgboost as xgb
 import numpy as np
-import pandas as pd
 import json
 
 print("🧪 Testing Trained Model")
@@ -22,22 +21,26 @@ print("✅ Encoders loaded")
 
 # Test prediction
 print("\n[3/3] Making test prediction...")
-test_data = pd.DataFrame(
-    {
-        "floor_price": [2.5],
-        "engagement_score": [0.75],
-        "conversion_probability": [0.20],
-        "historical_win_rate": [0.50],
-        "historical_avg_bid": [2.8],
-        "historical_avg_win_price": [3.0],
-        "device_type_encoded": [1.0],
-        "segment_category_encoded": [0.0],
-        "hour_of_day": [14],
-        "day_of_week": [2],
-        "country_encoded": [1.0],
-        "campaign_spend_last_7d": [250.0],
-        "campaign_conversions_last_7d": [8.0],
-    }
+# Features in training column order (see BidOptimizer.FEATURE_COLUMNS)
+test_data = np.array(
+    [
+        [
+            2.5,  # floor_price
+            0.75,  # engagement_score
+            0.20,  # conversion_probability
+            0.50,  # historical_win_rate
+            2.8,  # historical_avg_bid
+            3.0,  # historical_avg_win_price
+            1.0,  # device_type_encoded
+            0.0,  # segment_category_encoded
+            14,  # hour_of_day
+            2,  # day_of_week
+            1.0,  # country_encoded
+            250.0,  # campaign_spend_last_7d
+            8.0,  # campaign_conversions_last_7d
+        ]
+    ],
+    dtype=np.float32,
 )
 
 prediction = model.predict(test_data)
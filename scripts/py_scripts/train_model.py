@@ -8,21 +8,171 @@ import os
 import sys
 import json
 import argparse
-import uuid
 import shutil
+import subprocess
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List, Tuple
+from urllib.parse import quote
 
+import joblib
 import numpy as np
 import pandas as pd
 import psycopg2
 import xgboost as xgb
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+import onnx
 import onnxmltools
 from onnxconverter_common import FloatTensorType
+from onnxconverter_common.onnx_ex import get_maximum_opset_supported
 import yaml
 
+# pyarrow is optional: it holds the synthetic campaign_id column without a
+# Python object per row; also needed by ADBC
+try:
+  import pyarrow as pa
+except ImportError:
+  pa = None
+
+# ADBC is optional: it hands query results back as Arrow columns instead of
+# Python rows; without it we load through psycopg2
+try:
+  import adbc_driver_postgresql.dbapi as adbc_pg
+except ImportError:
+  adbc_pg = None
+
+# Numba is optional: it fuses the synthetic target into one parallel pass;
+# without it we use in-place NumPy
+try:
+  from numba import njit, prange
+except ImportError:
+  njit = None
+
+
+# Where the 32 hex digits go in a 36-character dashed UUID
+_UUID_HEX_POSITIONS = np.array(
+    [i for i in range(36) if i not in (8, 13, 18, 23)], dtype=np.intp)
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+# Standard ONNX ops that onnxruntime's quantize_dynamic rewrites to INT8
+_QUANTIZABLE_OPS = frozenset(
+    ("MatMul", "Gemm", "Conv", "Attention", "LSTM", "GRU"))
+
+
+def uuid4_column(n: int):
+  """
+  Generate a column of n random UUID4 strings from one block of random bytes
+
+  The dashed ASCII text is assembled in one uint8 buffer. With pyarrow it
+  becomes an Arrow string array directly, without a Python str per row.
+
+  Uses its own unseeded generator, like uuid.uuid4(), so the seeded
+  generator behind the other synthetic columns is left untouched.
+  """
+  buf = np.frombuffer(
+      np.random.default_rng().bytes(16 * n), dtype=np.uint8
+  ).reshape(n, 16).copy()
+  buf[:, 6] = (buf[:, 6] & 0x0F) | 0x40  # Version 4
+  buf[:, 8] = (buf[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+
+  nibbles = np.empty((n, 32), dtype=np.uint8)
+  nibbles[:, 0::2] = buf >> 4
+  nibbles[:, 1::2] = buf & 0x0F
+  chars = np.full((n, 36), ord("-"), dtype=np.uint8)
+  chars[:, _UUID_HEX_POSITIONS] = _HEX_DIGITS[nibbles]
+
+  if pa is None:
+    return chars.view("S36").ravel().astype(str)
+  # int64 offsets: int32 ones overflow past ~59.6M rows of 36 bytes
+  offsets = np.arange(0, 36 * (n + 1), 36, dtype=np.int64)
+  ids = pa.LargeStringArray.from_buffers(
+      n, pa.py_buffer(offsets), pa.py_buffer(chars))
+  return pd.arrays.ArrowExtensionArray(ids)
+
+
+def top_k(names: List[str], values: np.ndarray,
+          k: int) -> List[Tuple[str, float]]:
+  """
+  The k largest values with their names, largest first
+
+  argpartition selects the k in O(n); only those k are then sorted.
+  """
+  values = np.asarray(values)
+  k = min(k, len(values))
+  if k == 0:
+    return []
+  top = np.argpartition(values, -k)[-k:]
+  top = top[np.argsort(-values[top], kind="stable")]
+  return [(names[i], float(values[i])) for i in top]
+
+
+def default_device() -> str:
+  """Return "cuda" if XGBoost was built with CUDA and a GPU is visible"""
+  if not xgb.build_info().get("USE_CUDA"):
+    return "cpu"
+  try:
+    gpus = subprocess.run(["nvidia-smi", "-L"], capture_output=True)
+  except OSError:
+    return "cpu"
+  return "cuda" if gpus.returncode == 0 else "cpu"
+
+
+def _synthetic_target_numpy(floor_price, engagement, conversion, win_rate,
+                            noise):
+  # Accumulated in place into one buffer through a single scratch array
+  # instead of a temporary per term
+  n = len(floor_price)
+  target = np.empty(n)
+  scratch = np.empty(n)
+  np.multiply(floor_price, 1.3, out=target)  # Base markup
+  target += np.multiply(engagement, 0.8, out=scratch)  # User engagement value
+  target += np.multiply(conversion, 3.0, out=scratch)  # Conversion value
+  np.subtract(win_rate, 0.4, out=scratch)
+  scratch *= 1.5
+  target += scratch  # Historical performance
+  target += noise  # Some noise
+
+  # Ensure optimal_bid is reasonable
+  np.maximum(
+      target, np.multiply(floor_price, 1.01, out=scratch), out=target
+  )  # At least 1% above floor
+  np.minimum(
+      target, np.multiply(floor_price, 5.0, out=scratch), out=target
+  )  # Max 5x floor price
+  return target
+
+
+def _synthetic_target_loop(floor_price, engagement, conversion, win_rate,
+                           noise):
+  # Same operations in the same order as the NumPy version, and no
+  # fastmath, so both produce identical targets
+  n = floor_price.shape[0]
+  target = np.empty(n)
+  for i in prange(n):
+    v = (floor_price[i] * 1.3 + engagement[i] * 0.8 + conversion[i] * 3.0
+         + (win_rate[i] - 0.4) * 1.5 + noise[i])
+    v = max(v, floor_price[i] * 1.01)
+    target[i] = min(v, floor_price[i] * 5.0)
+  return target
+
+
+if njit is not None:
+  _synthetic_target_loop = njit(parallel=True, cache=True)(
+      _synthetic_target_loop)
+
+
+def synthetic_target(floor_price, engagement, conversion, win_rate, noise):
+  """
+  Realistic optimal_bid (target variable) from the synthetic features,
+  clipped to between 1.01x and 5x the floor price
+  """
+  if njit is None:
+    return _synthetic_target_numpy(floor_price, engagement, conversion,
+                                   win_rate, noise)
+  return _synthetic_target_loop(floor_price, engagement, conversion,
+                                win_rate, noise)
+
 
 class BidOptimizer:
   """
@@ -57,6 +207,8 @@ class BidOptimizer:
       self.config = yaml.safe_load(f)
 
     self.model = None
+    # "xgboost", or "hgbr" for sklearn's HistGradientBoostingRegressor
+    self.backend = "xgboost"
     self.feature_encoders = {}
     self.scaler = None
 
@@ -70,6 +222,15 @@ class BidOptimizer:
         password=self.config["database"]["password"],
     )
 
+  def database_uri(self) -> str:
+    """PostgreSQL connection URI for the configured database"""
+    db = self.config["database"]
+    return (
+        f"postgresql://{quote(str(db['user']), safe='')}:"
+        f"{quote(str(db['password']), safe='')}@{db['host']}:{db['port']}/"
+        f"{quote(str(db['name']), safe='')}"
+    )
+
   def generate_synthetic_data(self, n_samples: int = 5000) -> pd.DataFrame:
     """
     Generate synthetic training data (no database required!)
@@ -80,23 +241,24 @@ class BidOptimizer:
     Returns:
         DataFrame with synthetic training data
     """
-    np.random.seed(42)
+    # PCG64 generator: faster than the legacy global MT19937 stream
+    rng = np.random.default_rng(42)
 
     device_types = ["mobile", "desktop", "tablet"]
     categories = ["premium", "standard", "value", "new_user"]
     countries = ["US", "GB", "CA", "AU", "DE", "FR", "JP"]
 
     data = {
-        "campaign_id": [str(uuid.uuid4()) for _ in range(n_samples)],
-        "floor_price": np.random.uniform(1.0, 5.0, n_samples),
+        "campaign_id": uuid4_column(n_samples),
+        "floor_price": rng.uniform(1.0, 5.0, n_samples),
         # Skewed distribution
-        "engagement_score": np.random.beta(2, 5, n_samples),
-        "conversion_probability": np.random.beta(
+        "engagement_score": rng.beta(2, 5, n_samples),
+        "conversion_probability": rng.beta(
             2, 8, n_samples
         ),  # Lower conversion rates
-        "device_type": np.random.choice(device_types, n_samples),
-        "segment_category": np.random.choice(categories, n_samples),
-        "country": np.random.choice(
+        "device_type": rng.choice(device_types, n_samples),
+        "segment_category": rng.choice(categories, n_samples),
+        "country": rng.choice(
             countries, n_samples, p=[0.4, 0.2, 0.15, 0.1, 0.05, 0.05, 0.05]
         ),
         "created_at": pd.date_range(
@@ -107,40 +269,35 @@ class BidOptimizer:
     df = pd.DataFrame(data)
 
     # Add temporal features
-    df["hour_of_day"] = pd.to_datetime(df["created_at"]).dt.hour
-    df["day_of_week"] = pd.to_datetime(df["created_at"]).dt.dayofweek
+    ts = pd.to_datetime(df["created_at"]).dt
+    df["hour_of_day"] = ts.hour.astype(np.int8)
+    df["day_of_week"] = ts.dayofweek.astype(np.int8)
 
     # Historical features (simulated)
-    df["historical_win_rate"] = np.random.beta(4, 6, n_samples)  # Around 0.4
-    df["historical_avg_bid"] = df["floor_price"] * np.random.uniform(
+    df["historical_win_rate"] = rng.beta(4, 6, n_samples)  # Around 0.4
+    df["historical_avg_bid"] = df["floor_price"] * rng.uniform(
         1.2, 2.0, n_samples
     )
-    df["historical_avg_win_price"] = df["historical_avg_bid"] * np.random.uniform(
+    df["historical_avg_win_price"] = df["historical_avg_bid"] * rng.uniform(
         0.8, 1.2, n_samples
     )
-    df["campaign_spend_last_7d"] = np.random.uniform(100, 10000, n_samples)
-    df["campaign_conversions_last_7d"] = np.random.poisson(5, n_samples)
+    df["campaign_spend_last_7d"] = rng.uniform(100, 10000, n_samples)
+    df["campaign_conversions_last_7d"] = rng.poisson(5, n_samples)
 
     # Generate realistic optimal_bid (target variable)
     # Formula considers multiple factors
-    df["optimal_bid"] = (
-        df["floor_price"] * 1.3  # Base markup
-        + df["engagement_score"] * 0.8  # User engagement value
-        + df["conversion_probability"] * 3.0  # Conversion value
-        + (df["historical_win_rate"] - 0.4) * 1.5  # Historical performance
-        + np.random.normal(0, 0.2, n_samples)  # Some noise
-    )
-
-    # Ensure optimal_bid is reasonable
-    df["optimal_bid"] = df["optimal_bid"].clip(
-        lower=df["floor_price"] * 1.01,  # At least 1% above floor
-        upper=df["floor_price"] * 5.0,  # Max 5x floor price
+    df["optimal_bid"] = synthetic_target(
+        df["floor_price"].to_numpy(),
+        df["engagement_score"].to_numpy(),
+        df["conversion_probability"].to_numpy(),
+        df["historical_win_rate"].to_numpy(),
+        rng.normal(0, 0.2, n_samples),  # Some noise
     )
 
     # Training set split
     train_ratio = 0.7
     val_ratio = 0.15
-    df["training_set"] = np.random.choice(
+    df["training_set"] = rng.choice(
         ["train", "validation", "test"],
         n_samples,
         p=[train_ratio, val_ratio, 1 - train_ratio - val_ratio],
@@ -168,6 +325,9 @@ class BidOptimizer:
         DataFrame with training examples
     """
     try:
+      # days is bound as a parameter so the statement text is the same on
+      # every run; ADBC and psycopg2 use different placeholders
+      placeholder = "$1" if adbc_pg is not None else "%s"
       query = f"""
             SELECT 
                 btd.*,
@@ -175,15 +335,23 @@ class BidOptimizer:
                 c.status as campaign_status
             FROM bid_training_data btd
             JOIN campaigns c ON btd.campaign_id = c.id
-            WHERE btd.created_at >= NOW() - INTERVAL '{days} days'
+            WHERE btd.created_at >= NOW() - {placeholder} * INTERVAL '1 day'
               AND btd.optimal_bid > 0
               AND btd.optimal_bid < 100  -- Remove outliers
             ORDER BY btd.created_at DESC
             """
 
-      conn = self.connect_db()
-      df = pd.read_sql(query, conn)
-      conn.close()
+      if adbc_pg is not None:
+        # Arrow-backed columns, no per-cell Python decoding
+        with adbc_pg.connect(self.database_uri()) as conn:
+          with conn.cursor() as cursor:
+            cursor.execute(query, (days,))
+            df = cursor.fetch_arrow_table().to_pandas(
+                types_mapper=pd.ArrowDtype)
+      else:
+        conn = self.connect_db()
+        df = pd.read_sql(query, conn, params=(days,))
+        conn.close()
 
       print(f"Loaded {len(df)} training examples from database")
       return df
@@ -204,22 +372,32 @@ class BidOptimizer:
     """
     print("Engineering features...")
 
-    # Time-based features
-    df["hour_of_day"] = pd.to_datetime(df["created_at"]).dt.hour
-    df["day_of_week"] = pd.to_datetime(df["created_at"]).dt.dayofweek
-    df["is_weekend"] = df["day_of_week"].isin([5, 6]).astype(int)
-    df["is_business_hours"] = df["hour_of_day"].between(9, 17).astype(int)
+    # Time-based features, parsing created_at once
+    ts = pd.to_datetime(df["created_at"], cache=True).dt
+    df["hour_of_day"] = ts.hour.astype(np.int8)
+    df["day_of_week"] = ts.dayofweek.astype(np.int8)
+    df["is_weekend"] = (df["day_of_week"] >= 5).astype(np.int8)
+    df["is_business_hours"] = df["hour_of_day"].between(9, 17).astype(np.int8)
 
     # Categorical encoding with frequency
     for col in ["device_type", "segment_category", "country"]:
       encoded_col = f"{col}_encoded"
 
-      # Use frequency encoding
-      freq_encoding = df[col].value_counts().to_dict()
-      df[encoded_col] = df[col].map(freq_encoding).fillna(0)
+      # Use frequency encoding, counted on the categorical codes: bincount
+      # plus a gather, with no per-row string hashing. Missing values have
+      # code -1, which picks the trailing 0 count.
+      df[col] = df[col].astype("category")
+      categories = df[col].cat.categories
+      codes = df[col].cat.codes.to_numpy()
+      counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+      df[encoded_col] = np.append(counts, 0)[codes].astype(np.float32)
 
       # Save encoder for inference
-      self.feature_encoders[col] = freq_encoding
+      self.feature_encoders[col] = {
+          category: int(count)
+          for category, count in zip(categories, counts)
+          if count > 0
+      }
 
     # Interaction features
     df["engagement_x_conversion"] = (
@@ -228,21 +406,24 @@ class BidOptimizer:
     df["floor_price_ratio"] = df["floor_price"] / \
         (df["historical_avg_bid"] + 0.01)
 
-    # Handle missing values
-    df["engagement_score"] = df["engagement_score"].fillna(0.5)
-    df["conversion_probability"] = df["conversion_probability"].fillna(0.05)
-    df["historical_win_rate"] = df["historical_win_rate"].fillna(0.3)
-    df["historical_avg_bid"] = df["historical_avg_bid"].fillna(
-        df["floor_price"])
-    df["historical_avg_win_price"] = df["historical_avg_win_price"].fillna(
-        df["floor_price"]
+    # Handle missing values: constants in one pass, then the floor price
+    # for the historical prices
+    df.fillna(
+        {
+            "engagement_score": 0.5,
+            "conversion_probability": 0.05,
+            "historical_win_rate": 0.3,
+        },
+        inplace=True,
     )
+    for col in ["historical_avg_bid", "historical_avg_win_price"]:
+      df[col] = df[col].where(df[col].notna(), df["floor_price"])
 
     return df
 
   def prepare_dataset(
       self, df: pd.DataFrame, test_size: float = 0.2
-  ) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]:
+  ) -> Tuple[pd.DataFrame, np.ndarray, pd.DataFrame, np.ndarray]:
     """
     Prepare train/val split
 
@@ -253,22 +434,26 @@ class BidOptimizer:
     Returns:
         X_train, y_train, X_val, y_val
     """
-    # Select features
-    X = df[self.FEATURE_COLUMNS].copy()
-    y = df["optimal_bid"].copy()
+    # Select features as float32: halves the bytes XGBoost copies and scans
+    # when it builds the training matrix
+    X = df[self.FEATURE_COLUMNS].to_numpy(dtype=np.float32, na_value=np.nan)
+    y = df["optimal_bid"].to_numpy(dtype=np.float32, na_value=np.nan)
 
-    # Remove any rows with NaN
-    mask = ~(X.isna().any(axis=1) | y.isna())
+    # Remove any rows with NaN, in one pass over the contiguous array
+    mask = ~(np.isnan(X).any(axis=1) | np.isnan(y))
     X = X[mask]
     y = y[mask]
 
     print(f"Dataset size after cleaning: {len(X)}")
     print(f"Feature columns: {self.FEATURE_COLUMNS}")
 
-    # Split
+    # Split the plain arrays, then name the columns again (without copying)
+    # so the model is saved with its feature names
     X_train, X_val, y_train, y_val = train_test_split(
         X, y, test_size=test_size, random_state=42, shuffle=True
     )
+    X_train = pd.DataFrame(X_train, columns=self.FEATURE_COLUMNS, copy=False)
+    X_val = pd.DataFrame(X_val, columns=self.FEATURE_COLUMNS, copy=False)
 
     print(f"Train set: {len(X_train)} samples")
     print(f"Validation set: {len(X_val)} samples")
@@ -278,10 +463,11 @@ class BidOptimizer:
   def train(
       self,
       X_train: pd.DataFrame,
-      y_train: pd.Series,
+      y_train: np.ndarray,
       X_val: pd.DataFrame,
-      y_val: pd.Series,
+      y_val: np.ndarray,
       params: Dict = None,
+      backend: str = "xgboost",
   ) -> Dict:
     """
     Train XGBoost model
@@ -289,11 +475,55 @@ class BidOptimizer:
     Args:
         X_train, y_train: Training data
         X_val, y_val: Validation data
-        params: Optional hyperparameters
+        params: Optional hyperparameters (XGBoost backend only)
+        backend: "xgboost", or "hgbr" to train sklearn's
+            HistGradientBoostingRegressor for comparison
 
     Returns:
         Dictionary of training metrics
     """
+    self.backend = backend
+    if backend == "hgbr":
+      train_rmse, train_mae = self._fit_hgbr(X_train, y_train)
+    else:
+      train_rmse, train_mae = self._fit_xgboost(
+          X_train, y_train, X_val, y_val, params)
+
+    # Evaluate
+    val_pred = self.model.predict(X_val)
+
+    # HistGradientBoostingRegressor has no built-in feature importances
+    importances = getattr(self.model, "feature_importances_", None)
+    metrics = {
+        "train_rmse": train_rmse,
+        "val_rmse": np.sqrt(mean_squared_error(y_val, val_pred)),
+        "train_mae": train_mae,
+        "val_mae": mean_absolute_error(y_val, val_pred),
+        # R² = 1 - MSE / Var(y)
+        "train_r2": 1.0 - train_rmse**2 / np.var(y_train, dtype=np.float64),
+        "val_r2": r2_score(y_val, val_pred),
+        "feature_importance": (
+            dict(zip(self.FEATURE_COLUMNS, importances.tolist()))
+            if importances is not None else {}
+        ),
+    }
+
+    print("\n=== Training Results ===")
+    print(f"Train RMSE: {metrics['train_rmse']:.4f}")
+    print(f"Val RMSE: {metrics['val_rmse']:.4f}")
+    print(f"Train R²: {metrics['train_r2']:.4f}")
+    print(f"Val R²: {metrics['val_r2']:.4f}")
+
+    if importances is not None:
+      print("\n=== Top 5 Important Features ===")
+      for feature, importance in top_k(self.FEATURE_COLUMNS, importances, 5):
+        print(f"{feature}: {importance:.4f}")
+
+    return metrics
+
+  def _fit_xgboost(self, X_train, y_train, X_val, y_val,
+                   params: Dict = None) -> Tuple[float, float]:
+    """Fit the XGBoost model, returning train RMSE and MAE"""
     print("Training XGBoost model...")
 
     # Default hyperparameters
@@ -309,61 +539,71 @@ class BidOptimizer:
           "reg_alpha": 0.1,
           "reg_lambda": 1.0,
           "objective": "reg:squarederror",
-          "n_jobs": -1,
+          # Bin features once and split over the histograms
+          "tree_method": "hist",
+          "max_bin": 256,
+          "grow_policy": "depthwise",
+          "device": default_device(),
+          # Histogram building stops scaling at around 8 threads
+          "n_jobs": min(8, os.cpu_count() or 1),
           "random_state": 42,
       }
 
     # Extract early_stopping_rounds if present (not a model parameter)
     early_stopping_rounds = params.pop("early_stopping_rounds", 20)
 
-    # Remove any other non-model parameters
+    # Remove any other non-model parameters; the metrics are fixed below
     params.pop("eval_metric", None)
 
-    self.model = xgb.XGBRegressor(**params)
+    self.model = xgb.XGBRegressor(**params, eval_metric=["rmse", "mae"])
 
     # Train with early stopping
     # Try the simpler approach that works with all versions
     try:
+      # The training set is evaluated from XGBoost's cached predictions
+      # each round, so its metrics need no separate predict pass
       self.model.fit(
           X_train,
           y_train,
-          eval_set=[(X_val, y_val)],
+          eval_set=[(X_train, y_train), (X_val, y_val)],
           verbose=False,  # Reduce output
       )
+      train_eval = self.model.evals_result()["validation_0"]
+      train_rmse = train_eval["rmse"][-1]
+      train_mae = train_eval["mae"][-1]
     except Exception as e:
       print(f"Training with basic configuration")
       self.model.fit(X_train, y_train)
+      train_pred = self.model.predict(X_train)
+      train_rmse = np.sqrt(mean_squared_error(y_train, train_pred))
+      train_mae = mean_absolute_error(y_train, train_pred)
 
-    # Evaluate
-    train_pred = self.model.predict(X_train)
-    val_pred = self.model.predict(X_val)
+    return train_rmse, train_mae
 
-    metrics = {
-        "train_rmse": np.sqrt(mean_squared_error(y_train, train_pred)),
-        "val_rmse": np.sqrt(mean_squared_error(y_val, val_pred)),
-        "train_mae": mean_absolute_error(y_train, train_pred),
-        "val_mae": mean_absolute_error(y_val, val_pred),
-        "train_r2": r2_score(y_train, train_pred),
-        "val_r2": r2_score(y_val, val_pred),
-        "feature_importance": dict(
-            zip(self.FEATURE_COLUMNS, self.model.feature_importances_.tolist())
-        ),
-    }
-
-    print("\n=== Training Results ===")
-    print(f"Train RMSE: {metrics['train_rmse']:.4f}")
-    print(f"Val RMSE: {metrics['val_rmse']:.4f}")
-    print(f"Train R²: {metrics['train_r2']:.4f}")
-    print(f"Val R²: {metrics['val_r2']:.4f}")
-
-    print("\n=== Top 5 Important Features ===")
-    sorted_features = sorted(
-        metrics["feature_importance"].items(), key=lambda x: x[1], reverse=True
+  def _fit_hgbr(self, X_train, y_train) -> Tuple[float, float]:
+    """
+    Fit sklearn's HistGradientBoostingRegressor with settings comparable to
+    the XGBoost defaults, returning train RMSE and MAE
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    print("Training HistGradientBoostingRegressor model...")
+    self.model = HistGradientBoostingRegressor(
+        max_iter=300,
+        max_depth=8,
+        learning_rate=0.05,
+        l2_regularization=1.0,
+        early_stopping=True,
+        validation_fraction=0.15,
+        n_iter_no_change=20,
+        random_state=42,
     )
-    for feature, importance in sorted_features[:5]:
-      print(f"{feature}: {importance:.4f}")
+    self.model.fit(X_train, y_train)
+    print(f"Stopped after {self.model.n_iter_} iterations")
 
-    return metrics
+    train_pred = self.model.predict(X_train)
+    return (np.sqrt(mean_squared_error(y_train, train_pred)),
+            mean_absolute_error(y_train, train_pred))
 
   def export_to_onnx(self, output_path: str):
     """
@@ -372,6 +612,10 @@ class BidOptimizer:
 
     Args:
         output_path: Path to save ONNX model
+
+    Returns:
+        Path the model was saved to (.json, or .joblib for hgbr, if ONNX
+        export failed)
     """
     print(f"\nExporting model: {output_path}")
 
@@ -391,41 +635,165 @@ class BidOptimizer:
           ("float_input", FloatTensorType([None, len(self.FEATURE_COLUMNS)]))
       ]
 
-      onnx_model = convert_xgb_new(
-          self.model, initial_types=initial_types, target_opset=12
+      if self.backend == "hgbr":
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType as SklFloat
+
+        # skl2onnx only accepts its own tensor types
+        initial_types = [
+            ("float_input", SklFloat([None, len(self.FEATURE_COLUMNS)]))
+        ]
+        convert = partial(convert_sklearn, self.model)
+      else:
+        # The converter only understands positional f0..fN feature names
+        booster = self.model.get_booster().copy()
+        booster.feature_names = None
+        booster.feature_types = None
+        convert = partial(convert_xgb_new, booster)
+
+      # Newest opset the config, the installed onnx and the converter all
+      # allow; the converter emits the matching ai.onnx.ml tree ensemble
+      # version. Opset 12 is the fallback if conversion at it fails.
+      target_opset = min(
+          self.config.get("export", {}).get("opset_version", 12),
+          onnx.defs.onnx_opset_version(),
+          get_maximum_opset_supported(),
       )
-
-      # Save ONNX model
-      with open(output_path, "wb") as f:
-        f.write(onnx_model.SerializeToString())
+      try:
+        onnx_model = convert(
+            initial_types=initial_types, target_opset=target_opset)
+      except Exception as e:
+        if target_opset == 12:
+          raise
+        # Converter errors can embed the whole tree ensemble; first line only
+        print(f"⚠️  ONNX export at opset {target_opset} failed "
+              f"({str(e).splitlines()[0]}), "
+              f"retrying with opset 12")
+        onnx_model = convert(initial_types=initial_types, target_opset=12)
+
+      # Save ONNX model, graph-optimized ahead of time
+      self.save_optimized_onnx(onnx_model, output_path)
 
       print(f"✅ Model exported to ONNX: {output_path}")
+      self.quantize_onnx(output_path)
 
-    except (TypeError, AttributeError, ValueError) as e:
-      # ONNX export failed, use XGBoost native format
-      print(f"⚠️  ONNX export failed: {e}")
-      print(f"   Saving as XGBoost native format instead...")
-
-      # Change extension to .json
-      xgb_path = output_path.replace(".onnx", ".json")
-      self.model.save_model(xgb_path)
-
-      print(f"✅ Model saved to XGBoost format: {xgb_path}")
-      print(f"   Note: For Go integration, you'll need to:")
-      print(f"   1. Fix ONNX package versions, OR")
-      print(f"   2. Use xgboost-go library")
-
-      # Update output_path for encoder saving
-      output_path = xgb_path
+    except Exception as e:
+      # Converters and ONNX Runtime raise their own exception types (ORT's
+      # Fail and InvalidGraph, onnxmltools' RuntimeError); none of them may
+      # stop the run before the native model and encoders are published.
+      # Drop a half-written ONNX file so it is not mistaken for an export
+      if os.path.exists(output_path):
+        os.remove(output_path)
+
+      if self.backend == "hgbr":
+        # skl2onnx rejects models from newer scikit-learn releases; the
+        # joblib copy saved by main() is the only one then
+        print(f"⚠️  ONNX export failed: {str(e).splitlines()[0]}")
+        print(f"   Check the skl2onnx / scikit-learn pair in requirements.txt")
+        output_path = os.path.splitext(output_path)[0] + ".joblib"
+        if not os.path.exists(output_path):
+          joblib.dump(self.model, output_path)
+        print(f"✅ Model kept in joblib format: {output_path}")
+      else:
+        # ONNX export failed, use XGBoost native format
+        print(f"⚠️  ONNX export failed: {str(e).splitlines()[0]}")
+
+        # Change extension to .json; main() has usually saved it already
+        xgb_path = output_path.replace(".onnx", ".json")
+        if not os.path.exists(xgb_path):
+          print(f"   Saving as XGBoost native format instead...")
+          self.model.save_model(xgb_path)
+
+        print(f"✅ Model saved to XGBoost format: {xgb_path}")
+        print(f"   Note: For Go integration, you'll need to:")
+        print(f"   1. Fix ONNX package versions, OR")
+        print(f"   2. Use xgboost-go library")
+
+        # Update output_path for encoder saving
+        output_path = xgb_path
 
     # Save feature encoders for Go
-    encoder_path = output_path.replace(".onnx", "_encoders.json").replace(
-        ".json", "_encoders.json"
-    )
+    encoder_path = os.path.splitext(output_path)[0] + "_encoders.json"
     with open(encoder_path, "w") as f:
-      json.dump(self.feature_encoders, f, indent=2)
+      f.write(json.dumps(self.feature_encoders, separators=(",", ":")))
 
     print(f"✅ Feature encoders saved to: {encoder_path}")
+    return output_path
+
+  def save_optimized_onnx(self, onnx_model, output_path: str):
+    """
+    Save the ONNX model with ONNX Runtime's graph optimizations applied
+
+    ORT writes the optimized graph when a session is created with
+    optimized_model_filepath, so loading it later skips that work. The
+    extended level is used because ORT_ENABLE_ALL adds layout changes that
+    tie the saved file to the machine it was optimized on.
+
+    ORT declares every opset it knows in the saved file; those imports are
+    cut back to the converter's, so older runtimes (the Go side) still load it.
+    """
+    try:
+      import onnxruntime as ort
+    except ImportError:
+      print("⚠️  onnxruntime not installed, saving unoptimized ONNX graph")
+      with open(output_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+      return
+
+    raw_path = output_path.replace(".onnx", "_raw.onnx")
+    with open(raw_path, "wb") as f:
+      f.write(onnx_model.SerializeToString())
+    try:
+      so = ort.SessionOptions()
+      so.graph_optimization_level = (
+          ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+      so.optimized_model_filepath = output_path
+      ort.InferenceSession(raw_path, so, providers=["CPUExecutionProvider"])
+    finally:
+      os.remove(raw_path)
+
+    optimized = onnx.load(output_path)
+    versions = {op.domain: op.version for op in onnx_model.opset_import}
+    used = {node.domain for node in optimized.graph.node} | set(versions)
+    opsets = [
+        onnx.helper.make_opsetid(op.domain, versions.get(op.domain, op.version))
+        for op in optimized.opset_import
+        if op.domain in used
+    ]
+    del optimized.opset_import[:]
+    optimized.opset_import.extend(opsets)
+    onnx.save(optimized, output_path)
+
+  def quantize_onnx(self, onnx_path: str):
+    """
+    Save an INT8 dynamically quantized copy of the ONNX model next to it
+
+    quantize_dynamic only rewrites standard ai.onnx weight ops (MatMul,
+    Gemm, ...). A graph made purely of ai.onnx.ml tree ensembles, which is
+    what both backends export, has none: tree thresholds and leaf values
+    are attributes, not weight tensors. Such graphs are skipped without
+    running the quantizer, keeping the FP32 model as the only export.
+    """
+    graph = onnx.load(onnx_path).graph
+    if not any(node.domain in ("", "ai.onnx")
+               and node.op_type in _QUANTIZABLE_OPS for node in graph.node):
+      return None
+
+    try:
+      from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+      print("⚠️  onnxruntime not installed, skipping INT8 quantization")
+      return None
+
+    int8_path = onnx_path.replace(".onnx", "_int8.onnx")
+    try:
+      quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    except ValueError as e:
+      print(f"⚠️  INT8 quantization skipped, keeping FP32 only: {e}")
+      return None
+
+    print(f"✅ INT8 model saved to: {int8_path}")
+    return int8_path
 
   def save_metadata(self, metrics: Dict, output_path: str):
     """Save model metadata to database (if available)"""
@@ -456,7 +824,7 @@ class BidOptimizer:
           query,
           (
               output_path,
-              "xgboost_bid_optimizer",
+              f"{self.backend}_bid_optimizer",
               # Convert np.float64 to Python float
               float(metrics["train_rmse"]),
               float(metrics["val_rmse"]),
@@ -474,6 +842,26 @@ class BidOptimizer:
       print(f"   Continuing without database logging...")
 
 
+def publish_latest(src: str, dst: str):
+  """
+  Replace dst with src atomically: readers of dst see either the old file
+  or the new one, never a missing or half-written file
+
+  dst is hardlinked to src, so no bytes are copied; where hardlinks are
+  unavailable (another filesystem, some Windows setups) it is a copy.
+
+  A hardlinked dst is the same file as the archived src, so dst must never
+  be written in place: anything updating it writes a temp file and
+  os.replace()s it over dst, as this function does.
+  """
+  tmp = f"{dst}.tmp"
+  try:
+    os.link(src, tmp)
+  except OSError:
+    shutil.copy2(src, tmp)
+  os.replace(tmp, dst)
+
+
 def main():
   parser = argparse.ArgumentParser(description="Train bid optimization model")
   parser.add_argument("--config", default="config.yaml",
@@ -491,6 +879,14 @@ def main():
   parser.add_argument(
       "--samples", type=int, default=5000, help="Number of synthetic samples"
   )
+  parser.add_argument(
+      "--backend",
+      choices=["xgboost", "hgbr"],
+      default="xgboost",
+      help="Model to train; hgbr (sklearn HistGradientBoostingRegressor) is "
+      "for comparison: saved with joblib and exported to ONNX under "
+      "*_hgbr_* names, leaving the production model untouched",
+  )
 
   args = parser.parse_args()
 
@@ -509,80 +905,82 @@ def main():
   X_train, y_train, X_val, y_val = optimizer.prepare_dataset(df)
 
   # Train model
-  metrics = optimizer.train(X_train, y_train, X_val, y_val)
+  metrics = optimizer.train(X_train, y_train, X_val, y_val,
+                            backend=args.backend)
 
   # Export model
   timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-  model_path = args.output.replace(".onnx", f"_{timestamp}.onnx")
-
-  # Save model as JSON (ONNX has compatibility issues)
-  os.makedirs(os.path.dirname(model_path) if os.path.dirname(
-      model_path) else "models", exist_ok=True)
-  model_json = model_path.replace(".onnx", ".json")
-  optimizer.model.save_model(model_json)
-  print(f"✅ Model saved: {model_json}")
-
-  # Save encoders
-  encoder_path = model_json.replace(".json", "_encoders.json")
-  with open(encoder_path, 'w') as f:
-    json.dump(optimizer.feature_encoders, f, indent=2)
-  print(f"✅ Encoders saved: {encoder_path}")
 
-  actual_model_path = model_json
-
-  # Determine actual saved model path (might be .json if ONNX failed)
-  actual_model_path = model_path
-  if not os.path.exists(model_path):
-    # ONNX failed, model was saved as JSON
-    actual_model_path = model_path.replace(".onnx", ".json")
+  # hgbr is a comparison run: its files, "latest" included, carry the
+  # backend name so they never replace the production XGBoost model
+  output = args.output
+  if args.backend == "hgbr":
+    output = output.replace(".onnx", "_hgbr.onnx")
+  onnx_output = output.replace(".onnx", f"_{timestamp}.onnx")
+
+  if args.backend == "hgbr":
+    # sklearn models have no XGBoost JSON format: keep a joblib copy, so
+    # the fit survives a failed ONNX conversion
+    model_path = os.path.splitext(onnx_output)[0] + ".joblib"
+    os.makedirs(os.path.dirname(model_path) if os.path.dirname(
+        model_path) else "models", exist_ok=True)
+    joblib.dump(optimizer.model, model_path)
+    print(f"✅ Model saved: {model_path}")
+
+    onnx_path = optimizer.export_to_onnx(onnx_output)
+  else:
+    # Save model as JSON for the Python service (ONNX has compatibility
+    # issues there)
+    model_path = output.replace(".onnx", f"_{timestamp}.json")
+    os.makedirs(os.path.dirname(model_path) if os.path.dirname(
+        model_path) else "models", exist_ok=True)
+    optimizer.model.save_model(model_path)
+    print(f"✅ Model saved: {model_path}")
 
-  optimizer.save_metadata(metrics, actual_model_path)
+    # ONNX for Go inference, next to the JSON model; this also saves the
+    # encoders, which both share
+    onnx_path = optimizer.export_to_onnx(onnx_output)
 
-  print(f"\n✅ Training complete! Model saved to: {actual_model_path}")
+  encoder_path = os.path.splitext(model_path)[0] + "_encoders.json"
 
-  # Create copy to "latest" (Windows-compatible)
-  # Determine the correct extension for latest
-  if actual_model_path.endswith(".json"):
-    latest_path = args.output.replace(".onnx", "_latest.json")
-  else:
-    latest_path = args.output.replace(".onnx", "_latest.onnx")
+  optimizer.save_metadata(metrics, model_path)
 
-  # Remove old latest if it exists
-  if os.path.exists(latest_path):
-    os.remove(latest_path)
+  print(f"\n✅ Training complete! Model saved to: {model_path}")
 
-  # Copy the actual model file
-  shutil.copy2(actual_model_path, latest_path)
+  # Point "latest" at this run's model and encoders (Windows-compatible)
+  latest_path = output.replace(
+      ".onnx", "_latest" + os.path.splitext(model_path)[1])
+  publish_latest(model_path, latest_path)
   print(f"✅ Latest model: {latest_path}")
 
-  # Also copy encoders to latest
-  encoder_src = actual_model_path.replace(".onnx", "_encoders.json").replace(
-      ".json", "_encoders.json"
-  )
-  encoder_dst = latest_path.replace(".onnx", "_encoders.json").replace(
-      ".json", "_encoders.json"
-  )
+  encoder_dst = os.path.splitext(latest_path)[0] + "_encoders.json"
+  publish_latest(encoder_path, encoder_dst)
+  print(f"✅ Latest encoders: {encoder_dst}")
 
-  if os.path.exists(encoder_src):
-    if os.path.exists(encoder_dst):
-      os.remove(encoder_dst)
-    shutil.copy2(encoder_src, encoder_dst)
-    print(f"✅ Latest encoders: {encoder_dst}")
+  if onnx_path != model_path and onnx_path.endswith(".onnx"):
+    onnx_latest = output.replace(".onnx", "_latest.onnx")
+    publish_latest(onnx_path, onnx_latest)
+    print(f"✅ Latest ONNX model: {onnx_latest}")
 
   print("\n" + "=" * 60)
   print("🎉 Training Pipeline Complete!")
   print("=" * 60)
   print(f"\nYour trained model is ready:")
-  print(f"  Model: {actual_model_path}")
+  print(f"  Model: {model_path}")
   print(f"  Latest: {latest_path}")
   print(f"\nModel Performance:")
   print(f"  Train R²: {metrics['train_r2']:.4f}")
   print(f"  Val R²: {metrics['val_r2']:.4f}")
   print(f"  Val RMSE: ${metrics['val_rmse']:.4f}")
   print(f"\nNext steps:")
-  print(f"  1. Test predictions: python test_predictions.py")
-  print(f"  2. Integrate with your Go service")
-  print(f"  3. Deploy to production")
+  if args.backend == "hgbr":
+    print(f"  1. Compare these metrics with an XGBoost run's")
+    print(f"  2. The production model ({args.output.replace('.onnx', '_latest.*')}) "
+          f"is unchanged")
+  else:
+    print(f"  1. Test predictions: python test_predictions.py")
+    print(f"  2. Integrate with your Go service")
+    print(f"  3. Deploy to production")
   print("=" * 60)
 
 